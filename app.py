@@ -1,4 +1,5 @@
 import os
+import logging
 import streamlit as st
 from pathlib import Path
 from datetime import datetime
@@ -13,9 +14,12 @@ try:
 except ImportError:
     import setuptools._distutils as distutils
 
-from src.rag_core import RAGSystem, load_pokepedia_documents
+from src.rag_core import RAGSystem, load_pokepedia_documents, setup_logging
 from src.format_pokeapi_data import create_pokemon_documents
 
+# affiche les totaux d'intégration (niveau info) dans la console
+setup_logging(logging.INFO)
+
 def cleanup_rag_system():
     """nettoie le système rag en cas d'erreur."""
     try:
@@ -172,25 +176,29 @@ if question:
     # obtention de la réponse
     with st.spinner("Génération de la réponse..."):
         try:
-            result = st.session_state.rag_system.query(question)
+            # réponse affichée au fil de la génération
+            result = st.session_state.rag_system.query_stream(question)
 
             search_type = result.get("search_type", "semantic")
             if search_type == "exact":
                 st.success("Recherche exacte (index inverse)")
                 # Pour les recherches exactes, on n'affiche pas les métriques de confiance
                 st.subheader("Réponse")
-                st.write(result["answer"])
+                st.write_stream(result["answer"])
             else:
-                st.info("Recherche sémantique (vecteurs)")
-                # Affichage de la réponse
+                if search_type == "cache":
+                    st.info("Réponse en cache (question déjà posée)")
+                else:
+                    st.info("Recherche sémantique (vecteurs)")
+                # Affichage de la réponse (texte complet renvoyé une fois le flux terminé)
                 st.subheader("Réponse")
-                st.write(result["answer"])
+                answer = st.write_stream(result["answer"])
                 
                 # Évaluation de la réponse
                 with st.spinner("Évaluation de la réponse..."):
                     try:
                         from src.evaluation import context_overlap_score
-                        overlap = context_overlap_score(result["answer"], result["context"])
+                        overlap = context_overlap_score(answer, result["context"])
                         faithfulness = overlap
                     except Exception as e:
                         st.warning(f"Erreur lors de l'évaluation : {e}")
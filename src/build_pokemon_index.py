@@ -1,8 +1,9 @@
-import json
 import os
 from typing import Dict, List, Any
 from collections import defaultdict
 
+import orjson
+
 
 def load_pokemon_data() -> List[Dict[str, Any]]:
     """charge les données pokémon"""
@@ -11,8 +12,8 @@ def load_pokemon_data() -> List[Dict[str, Any]]:
 
     for filename in os.listdir(data_dir):
         if filename.endswith(".json"):
-            with open(os.path.join(data_dir, filename), "r", encoding="utf-8") as f:
-                pokemon_data.append(json.load(f))
+            with open(os.path.join(data_dir, filename), "rb") as f:
+                pokemon_data.append(orjson.loads(f.read()))
 
     return pokemon_data
 
@@ -113,8 +114,9 @@ def save_index(index: Dict[str, Any], filename: str):
     os.makedirs(output_dir, exist_ok=True)
 
     file_path = os.path.join(output_dir, filename)
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+    # même rendu que json.dump(..., ensure_ascii=False, indent=2)
+    with open(file_path, "wb") as f:
+        f.write(orjson.dumps(index, option=orjson.OPT_INDENT_2))
 
 
 # ---------------------------------------------------------------------------
@@ -5,6 +5,7 @@ python evaluate_rag.py --help pour afficher l'aide et les options
 """
 import asyncio
 import atexit
+import logging
 import shutil
 import sys
 import tempfile
@@ -12,13 +13,14 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List
 
+import numpy as np
 import pandas as pd
 
 # ajout du répertoire racine au path
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
 
-from src.rag_core import RAGSystem
+from src.rag_core import RAGSystem, setup_logging
 from src.evaluation import RAGEvaluator, evaluate_with_metrics
 from src.format_pokeapi_data import create_pokemon_documents
 
@@ -31,11 +33,11 @@ def load_questions(path: Path) -> List[Dict[str, Any]]:
         return json.load(f)
 
 
-async def evaluate_response(
+def evaluate_response(
     evaluator: RAGEvaluator, result: Dict[str, Any], test_case: Dict[str, Any]
 ) -> Dict[str, Any]:
-    """évalue une réponse avec ragas"""
-    scores = await evaluator.evaluate_response(
+    """évalue une réponse avec les métriques basiques"""
+    scores = evaluator.evaluate_response(
         result["answer"], test_case["reference"], result["context"]
     )
 
@@ -49,6 +51,25 @@ async def evaluate_response(
     }
 
 
+# colonnes d'un résultat d'évaluation
+TEXT_COLUMNS = ["question", "expected_type", "actual_type", "prediction", "reference"]
+METRIC_COLUMNS = ["faithfulness", "answer_relevancy", "context_precision", "context_recall"]
+
+
+def results_to_dataframe(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """construit le dataframe des résultats colonne par colonne.
+
+    évite l'inférence ligne à ligne de pd.DataFrame(list_of_dicts) : les
+    métriques deviennent directement des tableaux float64 contigus.
+    """
+    columns: Dict[str, Any] = {col: [row[col] for row in rows] for col in TEXT_COLUMNS}
+    for metric in METRIC_COLUMNS:
+        columns[metric] = np.fromiter(
+            (row[metric] for row in rows), dtype=np.float64, count=len(rows)
+        )
+    return pd.DataFrame(columns)
+
+
 def save_results(results_df: pd.DataFrame, output_dir: Path, engaged_mode: bool = False):
     """sauvegarde les résultats"""
     final_dir = Path("evaluation_results")
@@ -73,12 +94,13 @@ def save_results(results_df: pd.DataFrame, output_dir: Path, engaged_mode: bool
         print(f"erreur de sauvegarde : {e}")
 
 
-async def run_evaluation_in_batches(dataset_path: Path | None = None, batch_size: int = 10, engaged_mode: bool = False) -> None:
+async def run_evaluation_in_batches(dataset_path: Path | None = None, batch_size: int = 10, engaged_mode: bool = False, plot_options: Dict[str, Any] | None = None) -> None:
     """lance l'évaluation rag par lots pour éviter les limites de quota."""
     print("initialisation...")
     print(f"mode engagé: {'activé' if engaged_mode else 'désactivé'}")
     
-    rag_system = RAGSystem(engaged_mode=engaged_mode)
+    # cache de réponses désactivé : chaque question doit être réellement évaluée
+    rag_system = RAGSystem(engaged_mode=engaged_mode, qa_cache_enabled=False)
     evaluator = RAGEvaluator()
 
     # charge les documents
@@ -123,7 +145,7 @@ async def run_evaluation_in_batches(dataset_path: Path | None = None, batch_size
                     result = rag_system.query(test_case["question"])
 
                     # évalue avec métriques basiques
-                    result_data = await evaluate_response(evaluator, result, test_case)
+                    result_data = evaluate_response(evaluator, result, test_case)
                     batch_results.append(result_data)
 
                     # affiche les résultats
@@ -154,7 +176,7 @@ async def run_evaluation_in_batches(dataset_path: Path | None = None, batch_size
 
             # sauvegarde intermédiaire
             if batch_results:
-                batch_df = pd.DataFrame(batch_results)
+                batch_df = results_to_dataframe(batch_results)
                 batch_df.to_csv(output_dir / f"batch_{batch_idx}_results.csv", index=False)
                 print(f"\nlot {batch_idx} sauvegardé: {len(batch_results)} résultats")
 
@@ -165,13 +187,13 @@ async def run_evaluation_in_batches(dataset_path: Path | None = None, batch_size
                 await asyncio.sleep(delay)
 
         # crée le dataframe final
-        results_df = pd.DataFrame(all_results)
+        results_df = results_to_dataframe(all_results)
 
         # sauvegarde les résultats finaux
         results_df.to_csv(output_dir / "evaluation_results.csv", index=False)
 
-        # génère les graphiques
-        await evaluator.plot_results(results_df, output_dir, engaged_mode)
+        # génère les graphiques (options de la ligne de commande)
+        evaluator.plot_results(results_df, output_dir, engaged_mode, **(plot_options or {}))
 
         # sauvegarde dans le dossier final
         save_results(results_df, output_dir, engaged_mode)
@@ -198,12 +220,7 @@ async def run_evaluation_in_batches(dataset_path: Path | None = None, batch_size
         report_content.append("STATISTIQUES GLOBALES:")
         report_content.append("-" * 40)
 
-        metrics = [
-            "faithfulness",
-            "answer_relevancy",
-            "context_precision",
-            "context_recall",
-        ]
+        metrics = METRIC_COLUMNS
 
         global_stats = (
             results_df[metrics]
@@ -567,12 +584,13 @@ async def run_evaluation(dataset_path: Path | None = None, engaged_mode: bool =
     await run_evaluation_in_batches(dataset_path, batch_size=10, engaged_mode=engaged_mode)
 
 
-async def resume_evaluation(dataset_path: Path | None = None, start_from: int = 0, batch_size: int = 10, engaged_mode: bool = False) -> None:
+async def resume_evaluation(dataset_path: Path | None = None, start_from: int = 0, batch_size: int = 10, engaged_mode: bool = False, plot_options: Dict[str, Any] | None = None) -> None:
     """reprend l'évaluation à partir d'un certain point."""
     print("initialisation...")
     print(f"mode engagé: {'activé' if engaged_mode else 'désactivé'}")
     
-    rag_system = RAGSystem(engaged_mode=engaged_mode)
+    # cache de réponses désactivé : chaque question doit être réellement évaluée
+    rag_system = RAGSystem(engaged_mode=engaged_mode, qa_cache_enabled=False)
     evaluator = RAGEvaluator()
 
     # charge les documents
@@ -621,7 +639,7 @@ async def resume_evaluation(dataset_path: Path | None = None, start_from: int =
                     result = rag_system.query(test_case["question"])
 
                     # évalue avec métriques basiques
-                    result_data = await evaluate_response(evaluator, result, test_case)
+                    result_data = evaluate_response(evaluator, result, test_case)
                     batch_results.append(result_data)
 
                     # affiche les résultats
@@ -652,7 +670,7 @@ async def resume_evaluation(dataset_path: Path | None = None, start_from: int =
 
             # sauvegarde intermédiaire
             if batch_results:
-                batch_df = pd.DataFrame(batch_results)
+                batch_df = results_to_dataframe(batch_results)
                 batch_df.to_csv(output_dir / f"batch_{batch_idx}_results.csv", index=False)
                 print(f"\nlot {batch_idx} sauvegardé: {len(batch_results)} résultats")
 
@@ -663,13 +681,13 @@ async def resume_evaluation(dataset_path: Path | None = None, start_from: int =
                 await asyncio.sleep(delay)
 
         # crée le dataframe final
-        results_df = pd.DataFrame(all_results)
+        results_df = results_to_dataframe(all_results)
 
         # sauvegarde les résultats finaux
         results_df.to_csv(output_dir / "evaluation_results.csv", index=False)
 
-        # génère les graphiques
-        await evaluator.plot_results(results_df, output_dir, engaged_mode)
+        # génère les graphiques (options de la ligne de commande)
+        evaluator.plot_results(results_df, output_dir, engaged_mode, **(plot_options or {}))
 
         # sauvegarde dans le dossier final
         save_results(results_df, output_dir, engaged_mode)
@@ -689,6 +707,9 @@ if __name__ == "__main__":
     # enregistre la fonction de nettoyage
     atexit.register(cleanup)
 
+    # affiche les totaux d'intégration du système rag
+    setup_logging(logging.INFO)
+
     # affiche l'aide si demandé
     if "--help" in sys.argv or "-h" in sys.argv:
         print("""
@@ -706,6 +727,9 @@ Arguments:
 
 Options:
   --engaged            Active le mode engagé pour des réponses plus détaillées
+  --no-plots           Ne génère pas les graphiques (métriques sauvegardées quand même)
+  --quick              Graphiques en basse résolution (100 dpi), plus rapides à produire
+  --parquet            Sauvegarde les métriques en parquet (zstd) au lieu du csv
   --help, -h           Affiche cette aide
 
 Exemples:
@@ -723,6 +747,18 @@ Le mode engagé utilise des prompts plus détaillés et récupère plus de conte
     if engaged_mode:
         sys.argv.remove("--engaged")  # retire l'argument pour ne pas interférer avec les autres
 
+    # options des graphiques, retirées de la même façon
+    plot_options = {"enable_plots": True, "quick": False, "output_format": "csv"}
+    if "--no-plots" in sys.argv:
+        sys.argv.remove("--no-plots")
+        plot_options["enable_plots"] = False
+    if "--quick" in sys.argv:
+        sys.argv.remove("--quick")
+        plot_options["quick"] = True
+    if "--parquet" in sys.argv:
+        sys.argv.remove("--parquet")
+        plot_options["output_format"] = "parquet"
+
     # chemin du jeu de questions
     if len(sys.argv) > 1:
         dataset = Path(sys.argv[1])
@@ -746,10 +782,10 @@ Le mode engagé utilise des prompts plus détaillés et récupère plus de conte
         try:
             start_from = int(sys.argv[2])
             print(f"reprise de l'évaluation à partir de la question {start_from + 1}")
-            asyncio.run(resume_evaluation(dataset, start_from, engaged_mode=engaged_mode))
+            asyncio.run(resume_evaluation(dataset, start_from, engaged_mode=engaged_mode, plot_options=plot_options))
         except ValueError:
             print("argument de reprise invalide, lancement de l'évaluation complète")
-            asyncio.run(run_evaluation_in_batches(dataset, engaged_mode=engaged_mode))
+            asyncio.run(run_evaluation_in_batches(dataset, engaged_mode=engaged_mode, plot_options=plot_options))
     else:
         # lance l'évaluation complète
-        asyncio.run(run_evaluation_in_batches(dataset, engaged_mode=engaged_mode))
+        asyncio.run(run_evaluation_in_batches(dataset, engaged_mode=engaged_mode, plot_options=plot_options))
@@ -5,9 +5,54 @@ script pour formater les données pokeapi pour le système rag.
 import json
 import os
 from typing import List, Dict, Any
+
+import orjson
 from langchain.docstore.document import Document
 from src.pokepedia_data import PokepediaData
 
+# traduction française des noms de statistiques
+_STAT_FR = {
+    "hp": "pv",
+    "attack": "attaque",
+    "defense": "défense",
+    "special-attack": "attaque spéciale",
+    "special-defense": "défense spéciale",
+    "speed": "vitesse",
+}
+
+# seules clés lues par format_pokemon_document : le reste (moves, sprites,
+# game_indices...) est écarté dès le chargement
+_POKEMON_KEYS = (
+    "name",
+    "base_form",
+    "types",
+    "stats",
+    "abilities",
+    "species_info",
+    "pokepedia",
+)
+_SPECIES_KEYS = (
+    "flavor_text_entries",
+    "names",
+    "genera",
+    "is_legendary",
+    "is_mythical",
+    "is_baby",
+    "color",
+    "habitat",
+)
+
+
+def _prune_pokemon(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """ne garde que les champs utiles au formatage d'un pokémon."""
+    pokemon = {key: raw[key] for key in _POKEMON_KEYS if key in raw}
+    species_info = pokemon.get("species_info")
+    if isinstance(species_info, dict):
+        pokemon["species_info"] = {
+            key: species_info[key] for key in _SPECIES_KEYS if key in species_info
+        }
+    return pokemon
+
 
 def load_pokemon_data() -> List[Dict[str, Any]]:
     """charge les données pokémon depuis les fichiers json."""
@@ -17,7 +62,7 @@ def load_pokemon_data() -> List[Dict[str, Any]]:
     for filename in os.listdir(data_dir):
         if filename.endswith(".json"):
             with open(os.path.join(data_dir, filename), "r", encoding="utf-8") as f:
-                pokemon_data.append(json.load(f))
+                pokemon_data.append(_prune_pokemon(json.load(f)))
 
     return pokemon_data
 
@@ -34,10 +79,15 @@ def format_pokemon_document(
     types = [t["type"]["name"] for t in pokemon.get("types", [])]
     types_str = " et ".join(types)
 
-    # statistiques
-    stats = {
-        stat["stat"]["name"]: stat["base_stat"] for stat in pokemon.get("stats", [])
-    }
+    # statistiques (valeurs brutes et texte français en une seule passe)
+    stats = {}
+    stats_text = []
+    stat_fr = _STAT_FR.get  # alias local : évite la recherche d'attribut par stat
+    for stat in pokemon.get("stats", []):
+        stat_name = stat["stat"]["name"]
+        value = stat["base_stat"]
+        stats[stat_name] = value
+        stats_text.append(f"{stat_fr(stat_name, stat_name)}: {value}")
 
     # capacités
     abilities = [a["ability"]["name"] for a in pokemon.get("abilities", [])]
@@ -67,57 +117,48 @@ def format_pokemon_document(
         if lang in ["en", "fr", "ja"]:
             genera[lang] = genus_entry.get("genus", "")
 
-    # construction du texte
-    text = f"le pokémon {name}"
+    # construction du texte (fragments assemblés en une seule fois)
+    parts = [f"le pokémon {name}"]
     if name != base_form:
-        text += f" (forme de {base_form})"
+        parts.append(f" (forme de {base_form})")
 
-    text += f" est de type {types_str}. "
-    text += f"il possède les capacités suivantes : {abilities_str}. "
+    parts.append(f" est de type {types_str}. ")
+    parts.append(f"il possède les capacités suivantes : {abilities_str}. ")
 
     if stats:
-        text += f"ses statistiques de base sont : "
-        stats_text = []
-        for stat_name, value in stats.items():
-            stat_name_fr = {
-                "hp": "pv",
-                "attack": "attaque",
-                "defense": "défense",
-                "special-attack": "attaque spéciale",
-                "special-defense": "défense spéciale",
-                "speed": "vitesse",
-            }.get(stat_name, stat_name)
-            stats_text.append(f"{stat_name_fr}: {value}")
-        text += ", ".join(stats_text) + ". "
+        parts.append("ses statistiques de base sont : ")
+        parts.append(", ".join(stats_text) + ". ")
 
     # ajout des informations poképédia
     pokepedia_info = pokemon.get("pokepedia", {})
     if pokepedia_info:
         if pokepedia_info.get("description"):
-            text += f"\n\n{pokepedia_info['description']}"
+            parts.append(f"\n\n{pokepedia_info['description']}")
 
         if pokepedia_info.get("biology"):
-            text += f"\n\nbiologie : {pokepedia_info['biology']}"
+            parts.append(f"\n\nbiologie : {pokepedia_info['biology']}")
 
         if pokepedia_info.get("behavior"):
-            text += f"\n\ncomportement : {pokepedia_info['behavior']}"
+            parts.append(f"\n\ncomportement : {pokepedia_info['behavior']}")
 
         if pokepedia_info.get("habitat"):
-            text += f"\n\nhabitat : {pokepedia_info['habitat']}"
+            parts.append(f"\n\nhabitat : {pokepedia_info['habitat']}")
 
         if pokepedia_info.get("evolution"):
-            text += f"\n\névolution : {pokepedia_info['evolution']}"
+            parts.append(f"\n\névolution : {pokepedia_info['evolution']}")
 
         if pokepedia_info.get("mythology"):
-            text += f"\n\nmythologie : {pokepedia_info['mythology']}"
+            parts.append(f"\n\nmythologie : {pokepedia_info['mythology']}")
 
         if pokepedia_info.get("trivia"):
-            text += "\n\nfaits divers :"
+            parts.append("\n\nfaits divers :")
             for trivia in pokepedia_info["trivia"]:
-                text += f"\n- {trivia}"
+                parts.append(f"\n- {trivia}")
 
     elif flavor_text:
-        text += f"\n\ndescription : {flavor_text}"
+        parts.append(f"\n\ndescription : {flavor_text}")
+
+    text = "".join(parts)
 
     # métadonnées
     metadata = {
@@ -126,9 +167,9 @@ def format_pokemon_document(
         "base_form": base_form,
         "types": ", ".join(types),
         "abilities": ", ".join(abilities),
-        "stats": json.dumps(stats),
-        "names": json.dumps(names),
-        "genera": json.dumps(genera),
+        "stats": orjson.dumps(stats).decode(),
+        "names": orjson.dumps(names).decode(),
+        "genera": orjson.dumps(genera).decode(),
         "is_legendary": species_info.get("is_legendary", False),
         "is_mythical": species_info.get("is_mythical", False),
         "is_baby": species_info.get("is_baby", False),
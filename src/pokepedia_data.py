@@ -1,5 +1,6 @@
 import json
 import os
+import sys
 from typing import Dict, Any, Optional
 from pathlib import Path
 
@@ -21,7 +22,8 @@ class PokepediaData:
     def load_data(self):
         """Charge les données Poképédia depuis les fichiers JSON."""
         for file_path in self.data_dir.glob("*.json"):
-            pokemon_name = file_path.stem
+            # Clé en minuscules et internée une fois pour toutes au chargement
+            pokemon_name = sys.intern(file_path.stem.lower())
             try:
                 with open(file_path, "r", encoding="utf-8") as f:
                     self.pokemon_data[pokemon_name] = json.load(f)
@@ -48,8 +50,9 @@ class PokepediaData:
         Returns:
             Données enrichies du Pokémon
         """
+        # Les clés sont déjà en minuscules : accès direct au dictionnaire
         name = pokemon.get("name", "").lower()
-        pokepedia_info = self.get_pokemon_info(name)
+        pokepedia_info = self.pokemon_data.get(name)
 
         if pokepedia_info:
             # Les données peuvent provenir d'un scraping simple (champ "content")
@@ -1,104 +1,442 @@
 import os
-import json
-from typing import List, Dict, Any
+import re
+import sys
+import asyncio
+import logging
+import hashlib
+import sqlite3
+import threading
+import uuid
+from functools import lru_cache
+from operator import attrgetter
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
+import numpy as np
+import orjson
 
 # fix pour le problème de protobuf
 os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"] = "python"
 
-# fix pour le problème de distutils en python 3.12+
-try:
-    import distutils
-except ImportError:
-    import setuptools._distutils as distutils
+# fix pour le problème de distutils en python 3.12+ (inutile avant : module standard)
+if sys.version_info >= (3, 12):
+    try:
+        import distutils
+    except ImportError:
+        import setuptools._distutils as distutils
 
 # charge les variables d'environnement
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def setup_logging(level: int = logging.DEBUG) -> None:
+    """affiche les journaux du module (niveau debug = ancienne sortie verbeuse)."""
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s")
+    logger.setLevel(level)
+
+
 # clé api google (indispensable pour gemini)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY non trouvée")
 
-from langchain_core.prompts import PromptTemplate
+# seuls les imports légers restent ici : chroma, le client google et les runnables
+# sont importés là où ils servent, pour que les chargeurs restent rapides à importer
+from langchain_core.embeddings import Embeddings
 from langchain.docstore.document import Document
-from langchain.schema import StrOutputParser
-from langchain.schema.runnable import RunnablePassthrough
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+
+
+# documents poképédia déjà chargés, par dossier, avec la signature des fichiers
+_POKEPEDIA_CACHE: Dict[str, Tuple[Tuple, List[Document]]] = {}
+
+
+def _parse_pokepedia_file(json_file: os.DirEntry) -> Optional[Document]:
+    """lit un fichier poképédia ; renvoie None s'il est vide ou illisible."""
+    try:
+        with open(json_file.path, "rb") as f:
+            data = orjson.loads(f.read())
+
+        # extraire le nom du pokémon depuis le nom du fichier
+        pokemon_name = json_file.name[:-5]
+
+        # formater le contenu
+        content = data.get("content", "")
+        if not content:
+            return None
+
+        # créer un document avec métadonnées
+        logger.debug("document poképédia chargé: %s", pokemon_name)
+        return Document(
+            page_content=f"informations poképédia sur {pokemon_name}:\n\n{content}",
+            metadata={
+                "source": "pokepedia",
+                "pokemon_name": pokemon_name,
+                "url": data.get("url", ""),
+                "timestamp": data.get("timestamp", ""),
+                "content_type": "pokepedia_description",
+            },
+        )
+    except Exception as e:
+        logger.error("erreur lors du chargement de %s: %s", json_file.path, e)
+        return None
 
 
 def load_pokepedia_documents() -> List[Document]:
     """charge et formate les documents poképédia."""
     pokepedia_dir = Path("data/pokepedia")
-    documents = []
 
     if not pokepedia_dir.exists():
-        print("dossier poképédia non trouvé, création d'un exemple...")
-        return documents
+        logger.warning("dossier poképédia non trouvé")
+        return []
+
+    with os.scandir(pokepedia_dir) as entries:
+        json_files = [
+            entry
+            for entry in entries
+            if entry.name.endswith(".json") and entry.is_file(follow_symlinks=False)
+        ]
+
+    # fichiers inchangés depuis le dernier chargement : pas de relecture
+    signature = tuple(
+        sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in json_files
+        )
+    )
+    cached = _POKEPEDIA_CACHE.get(str(pokepedia_dir))
+    if cached is not None and cached[0] == signature:
+        return list(cached[1])
 
-    for json_file in pokepedia_dir.glob("*.json"):
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # extraire le nom du pokémon depuis le nom du fichier
-            pokemon_name = json_file.stem
-
-            # formater le contenu
-            content = data.get("content", "")
-            if content:
-                # créer un document avec métadonnées
-                doc = Document(
-                    page_content=f"informations poképédia sur {pokemon_name}:\n\n{content}",
-                    metadata={
-                        "source": "pokepedia",
-                        "pokemon_name": pokemon_name,
-                        "url": data.get("url", ""),
-                        "timestamp": data.get("timestamp", ""),
-                        "content_type": "pokepedia_description",
-                    },
-                )
-                documents.append(doc)
-                print(f"document poképédia chargé: {pokemon_name}")
+    documents = [
+        doc for doc in map(_parse_pokepedia_file, json_files) if doc is not None
+    ]
+
+    _POKEPEDIA_CACHE[str(pokepedia_dir)] = (signature, documents)
+    logger.info("total documents poképédia chargés: %d", len(documents))
+    return list(documents)
 
+
+def _load_index_file(path: Path) -> Optional[Dict[str, List[str]]]:
+    """lit un fichier d'index ; renvoie None s'il est absent."""
+    if not path.exists():
+        return None
+    return orjson.loads(path.read_bytes())
+
+
+_INDEX_FILES = {
+    "type": "type_index.json",
+    "status": "status_index.json",
+    "habitat": "habitat_index.json",
+    "color": "color_index.json",
+}
+
+
+@lru_cache(maxsize=4)
+def _read_index_files(
+    indexes_dir: str, signature: Tuple
+) -> Dict[str, Dict[str, List[str]]]:
+    """lit les fichiers d'index ; mémoïsé sur la signature (mtime, taille) des fichiers."""
+    indexes = {}
+
+    for index_name, filename in _INDEX_FILES.items():
+        try:
+            index = _load_index_file(Path(indexes_dir) / filename)
         except Exception as e:
-            print(f"erreur lors du chargement de {json_file}: {e}")
+            logger.error("erreur lors du chargement de l'index %s: %s", index_name, e)
+            continue
+        if index is not None:
+            indexes[index_name] = index
+            logger.debug("index %s chargé: %d catégories", index_name, len(index))
 
-    print(f"total documents poképédia chargés: {len(documents)}")
-    return documents
+    return indexes
 
 
 def load_index_data() -> Dict[str, Dict[str, List[str]]]:
     """charge les données d'index depuis les fichiers json."""
     indexes_dir = Path("data/indexes")
-    indexes = {}
 
     if not indexes_dir.exists():
-        print("dossier indexes non trouvé")
-        return indexes
-
-    index_files = {
-        "type": "type_index.json",
-        "status": "status_index.json",
-        "habitat": "habitat_index.json",
-        "color": "color_index.json",
-    }
-
-    for index_name, filename in index_files.items():
-        path = indexes_dir / filename
-        if path.exists():
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    indexes[index_name] = json.load(f)
-                print(
-                    f"index {index_name} chargé: {len(indexes[index_name])} catégories"
+        logger.warning("dossier indexes non trouvé")
+        return {}
+
+    signature = []
+    for filename in _INDEX_FILES.values():
+        try:
+            stat = (indexes_dir / filename).stat()
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+
+    # dictionnaire externe copié ; les index eux-mêmes sont partagés en lecture
+    return dict(_read_index_files(str(indexes_dir), tuple(signature)))
+
+
+def _run_sync(coro):
+    """exécute une coroutine depuis du code synchrone, boucle active ou non."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # appelé depuis une coroutine (évaluation) : boucle dédiée dans un thread
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class CachedEmbeddings(Embeddings):
+    """cache disque (sqlite) devant un modèle d'embeddings.
+
+    la clé est le sha-256 de (modèle + texte) : seuls les textes jamais vus
+    partent vers l'api, les autres sont relus depuis le cache.
+    """
+
+    # limite sqlite du nombre de paramètres par requête
+    _MAX_PARAMS = 900
+
+    def __init__(
+        self, inner: Embeddings, model: str, path: Path, query_cache_size: int = 1024
+    ) -> None:
+        self.inner = inner
+        self.model = model
+        # lru en mémoire des requêtes récentes (évite même l'aller-retour sqlite)
+        self._query_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._query_cache_size = max(1, query_cache_size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb (k BLOB PRIMARY KEY, v BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str, kind: str = "doc") -> bytes:
+        # requêtes et documents sont vectorisés différemment par l'api
+        raw = f"{self.model}\0{kind}\0{text}"
+        return hashlib.sha256(raw.encode("utf-8")).digest()
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """relit les vecteurs déjà en cache, par paquets de paramètres."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), self._MAX_PARAMS):
+                chunk = unique[start : start + self._MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT k, v FROM emb WHERE k IN ({placeholders})", chunk
                 )
-            except Exception as e:
-                print(f"erreur lors du chargement de l'index {index_name}: {e}")
+                for k, v in rows:
+                    found[k] = np.frombuffer(v, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, keys: List[bytes], vectors: List[List[float]]) -> None:
+        rows = [
+            (k, np.asarray(v, dtype=np.float32).tobytes())
+            for k, v in zip(keys, vectors)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO emb (k, v) VALUES (?, ?)", rows
+            )
 
-    return indexes
+    def _partition(self, texts: List[str]):
+        """sépare les textes déjà en cache de ceux à envoyer à l'api."""
+        keys = [self._key(t) for t in texts]
+        found = self._lookup(keys)
+
+        # seuls les textes absents du cache partent vers l'api (une fois chacun)
+        miss = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in miss:
+                miss[k] = t
+        return keys, found, miss
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, miss = self._partition(texts)
+        if miss:
+            vectors = self.inner.embed_documents(list(miss.values()))
+            self._store(list(miss), vectors)
+            found.update(zip(miss, vectors))
+        return [found[k] for k in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # hachage et accès sqlite hors de la boucle : les autres lots restent en vol
+        keys, found, miss = await asyncio.to_thread(self._partition, texts)
+        if miss:
+            vectors = await self.inner.aembed_documents(list(miss.values()))
+            await asyncio.to_thread(self._store, list(miss), vectors)
+            found.update(zip(miss, vectors))
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # instance partagée entre les sessions (threads) : lru modifié sous verrou
+        with self._lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+                return list(cached)
+
+        # appel api et sqlite hors du verrou (_lookup / _store le prennent eux-mêmes)
+        key = self._key(text, kind="query")
+        found = self._lookup([key])
+        if key in found:
+            vector = found[key]
+        else:
+            vector = self.inner.embed_query(text)
+            self._store([key], [vector])
+
+        # tuple immuable : l'appelant ne peut pas altérer l'entrée en cache
+        with self._lock:
+            self._query_cache[text] = tuple(vector)
+            if len(self._query_cache) > self._query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_PAGE_CONTENT = attrgetter("page_content")
+_METADATA = attrgetter("metadata")
+
+
+@lru_cache(maxsize=None)
+def _get_embeddings(embedding_model: str, cache_path: Path) -> CachedEmbeddings:
+    """embeddings partagés par toutes les instances (client api + cache sqlite)."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=embedding_model),
+        model=embedding_model,
+        path=cache_path,
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_chroma_client():
+    """client chroma unique pour le processus, en mémoire (rien à persister)."""
+    import chromadb
+
+    return chromadb.EphemeralClient()
+
+
+# types acceptés tels quels dans les métadonnées chroma
+_SCALARS = (str, int, float, bool, type(None))
+_SCALAR_TYPES = frozenset(_SCALARS)
+
+
+def _flatten_metadata_value(value: Any) -> Any:
+    """convertit une valeur de métadonnée complexe en type accepté par chroma."""
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, list):
+        # convertir les listes en chaînes
+        return ", ".join(str(item) for item in value)
+    if isinstance(value, dict):
+        # convertir les dictionnaires en chaînes json
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    # convertir les autres types en chaînes
+    return str(value)
+
+
+def _document_id(text: str, metadata: Dict[str, Any]) -> str:
+    """identifiant stable d'un document : empreinte du texte et des métadonnées."""
+    payload = orjson.dumps([text, metadata], option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _reverse_indexes(
+    indexes: Dict[str, Dict[str, List[str]]]
+) -> Dict[str, Dict[str, List[str]]]:
+    """inverse chaque index : nom du pokémon → catégories, dans l'ordre de l'index.
+
+    les noms sont mis en minuscules ici, une seule fois, comme ceux des documents.
+    """
+    reverse = {}
+    for index_name, mapping in indexes.items():
+        by_pokemon: Dict[str, List[str]] = {}
+        for category, pokemon_list in mapping.items():
+            for pokemon_name in pokemon_list:
+                # clés internées : une seule copie par nom, même d'un index à l'autre
+                categories = by_pokemon.setdefault(sys.intern(pokemon_name.lower()), [])
+                # un nom répété dans une même liste ne compte qu'une fois
+                if not categories or categories[-1] != category:
+                    categories.append(category)
+        reverse[index_name] = by_pokemon
+    return reverse
+
+
+# prompts à deux variables ({question}, {context}), formatés par format_map
+_PROMPT_ENGAGED = """you are a pokémon encyclopedia assistant. your task is to provide accurate, comprehensive, and well-structured information about pokémon based exclusively on the context provided below.
+
+critical instructions:
+1. only use information from the provided context. if the answer is not in the context, respond with "i don't have enough information to answer this question accurately."
+2. search thoroughly through the context for relevant information before answering.
+3. use all available context - do not ignore any relevant details.
+4. cite specific information from the context when possible.
+5. distinguish between different data sources in the context (pokeapi vs poképédia).
+
+context analysis guidelines:
+- for statistical questions (stats, types, abilities, evolution): look for pokeapi data first
+- for descriptive questions (appearance, behavior, lore): look for poképédia data first
+- for categorization questions (lists, types, habitats): use metadata indexes when available
+- for comparison questions: extract specific values from the context and compare them
+- for detailed descriptions: combine information from multiple context sources
+
+response structure:
+1. start with a direct answer to the question
+2. provide specific details from the context
+3. mention the source of information when relevant
+4. structure information logically (most important first)
+5. include numerical data when available in the context
+
+context sources to use:
+- pokeapi data: technical specifications, statistics, types, abilities, evolution chains
+- poképédia data: descriptions, biology, behavior, habitat, mythology, cultural aspects
+- metadata indexes: pokemon_types, is_legendary, is_mythical, habitat, color information
+
+question: {question}
+context: {context}
+
+answer:"""
+
+_PROMPT_DEFAULT = """you are a pokémon encyclopedia assistant. provide accurate and concise answers based exclusively on the context provided below.
+
+critical instructions:
+1. only use information from the provided context. if the answer is not in the context, respond with "i don't have enough information to answer this question accurately."
+2. search thoroughly through the context for relevant information.
+3. use all available context - do not ignore relevant details.
+4. be specific - cite exact values, names, and details from the context.
+
+context search strategy:
+- for statistics questions: look for pokeapi data with specific numbers
+- for description questions: look for poképédia content with detailed explanations
+- for list questions: use metadata indexes and context information
+- for comparison questions: extract and compare specific values from context
+- for general questions: combine the most relevant information from all sources
+
+response guidelines:
+1. keep answers concise but informative (3-5 sentences)
+2. start with the most important information
+3. include specific details from the context
+5. use exact values and names from the context
+
+context sources:
+- pokeapi: statistics, types, abilities, technical data
+- poképédia: descriptions, behavior, habitat, lore
+- metadata: type information, legendary status, habitat, color
+
+question: {question}
+context: {context}
+
+answer:"""
 
 
 class RAGSystem:
@@ -116,17 +454,45 @@ class RAGSystem:
         temperature: float = 0.0,
         max_tokens: int = 256,
         engaged_mode: bool = False,
+        ingest_batch_size: int = 128,
+        qa_cache_enabled: bool = False,
+        qa_cache_threshold: float = 0.05,
+        qa_cache_size: int = 5000,
+        hnsw_m: int = 32,
+        hnsw_construction_ef: int = 200,
+        hnsw_search_ef: int = 80,
     ) -> None:
-        import tempfile
+        from langchain_google_genai import ChatGoogleGenerativeAI
 
-        # dossier temporaire pour la bdd chroma
-        self.persist_directory = Path(tempfile.mkdtemp(prefix="chroma_db_"))
+        # client chroma partagé ; collections propres à l'instance
+        self._chroma_client = _get_chroma_client()
+        suffix = uuid.uuid4().hex
+        self._collection_name = f"rag_{suffix}"
+        self._qa_collection_name = f"qa_cache_{suffix}"
 
         # mode engagé
         self.engaged_mode = engaged_mode
 
-        # embeddings & llm
-        self.embeddings = GoogleGenerativeAIEmbeddings(model=embedding_model)
+        # taille des lots envoyés à chroma lors de l'indexation
+        self.ingest_batch_size = max(1, ingest_batch_size)
+
+        # paramètres hnsw de la collection principale
+        self.hnsw_metadata = {
+            "hnsw:space": "cosine",
+            "hnsw:M": hnsw_m,
+            "hnsw:construction_ef": hnsw_construction_ef,
+            "hnsw:search_ef": hnsw_search_ef,
+        }
+
+        # nombre d'appels d'embedding simultanés vers l'api google
+        self.embed_concurrency = max(
+            1, int(os.getenv("GOOGLE_EMBED_CONCURRENCY", "8"))
+        )
+
+        # embeddings & llm (cache persistant hors du dossier temporaire chroma)
+        self.embeddings = _get_embeddings(
+            embedding_model, Path(persist_directory) / "embed_cache.sqlite"
+        )
 
         # ajuster les tokens selon le mode
         if engaged_mode:
@@ -142,21 +508,41 @@ class RAGSystem:
         self.vectorstore = None
         self.retriever = None
 
+        # cache sémantique question → réponse (distance cosinus < 0.05, soit une
+        # similarité > 0.95, et mêmes pokémon cités dans les deux questions) ;
+        # désactivé par défaut : « taille » et « poids » d'un même pokémon restent
+        # trop proches pour être distingués de façon sûre
+        self.qa_cache_enabled = qa_cache_enabled
+        self.qa_cache = self._new_qa_cache()
+        self.qa_cache_threshold = qa_cache_threshold
+        self.qa_cache_size = max(1, qa_cache_size)
+        self._qa_cache_ids = deque()
+        # premier niveau : question identique (normalisée), sans embedding ni chroma
+        self._exact_cache: "OrderedDict[Tuple[bool, str], Dict[str, Any]]" = (
+            OrderedDict()
+        )
+        # noms des pokémon indexés, reconnus dans les questions (voir embed_documents)
+        self._entity_re = None
+
+        # chaîne construite une fois puis réutilisée à chaque question
+        self._chain = None
+
         # prompt : ton neutre et concis
+        self._prompt_mode = None
         self._update_prompt_template()
 
     def embed_documents(
         self, documents: List[Document], pokepedia_documents: List[Document] = None
     ) -> None:
         """vectorise et indexe la liste de documents dans chroma."""
-        from langchain.embeddings.base import Embeddings
+        from langchain_community.vectorstores import Chroma
 
         # charger les documents poképédia si pas fournis
         if pokepedia_documents is None:
             pokepedia_documents = load_pokepedia_documents()
 
         # charger les données d'index
-        indexes = load_index_data()
+        indexes = _reverse_indexes(load_index_data())
 
         # enrichir les métadonnées des documents avec les informations d'index
         enriched_documents = self._enrich_documents_with_indexes(documents, indexes)
@@ -167,30 +553,122 @@ class RAGSystem:
         # combiner tous les documents
         all_documents = enriched_documents + enriched_pokepedia
 
-        print(
-            f"intégration de {len(documents)} documents pokeapi + {len(pokepedia_documents)} documents poképédia"
+        logger.info(
+            "intégration de %d documents pokeapi + %d documents poképédia",
+            len(documents),
+            len(pokepedia_documents),
+        )
+
+        # identifiants dérivés du contenu : un document identique n'est gardé qu'une fois
+        by_id = {}
+        for doc in all_documents:
+            by_id.setdefault(_document_id(doc.page_content, doc.metadata), doc)
+
+        # noms connus (pokeapi et poképédia) : deux questions ne partagent une
+        # réponse en cache que si elles citent les mêmes pokémon
+        names = {
+            name.lower()
+            for doc in all_documents
+            for name in (doc.metadata.get("name"), doc.metadata.get("pokemon_name"))
+            if isinstance(name, str) and name
+        }
+        # noms longs d'abord : « mewtwo » n'est pas lu comme « mew »
+        alternation = "|".join(map(re.escape, sorted(names, key=len, reverse=True)))
+        self._entity_re = (
+            re.compile(rf"(?<![\w-])(?:{alternation})(?![\w-])") if names else None
         )
 
         try:
-            self.vectorstore = Chroma.from_documents(
-                documents=all_documents,
-                embedding=self.embeddings,
-                persist_directory=str(self.persist_directory),
+            if self.vectorstore is None:
+                # collection reprise si elle existe encore (après une erreur de requête)
+                self.vectorstore = Chroma(
+                    client=self._chroma_client,
+                    collection_name=self._collection_name,
+                    embedding_function=self.embeddings,
+                    collection_metadata=self.hnsw_metadata,
+                )
+            # réindexation : seuls les documents modifiés sont retirés / ajoutés
+            existing = set(self.vectorstore.get(include=[])["ids"])
+
+            stale = [doc_id for doc_id in existing if doc_id not in by_id]
+            if stale:
+                self.vectorstore.delete(ids=stale)
+
+            new_ids = [doc_id for doc_id in by_id if doc_id not in existing]
+            texts = [by_id[doc_id].page_content for doc_id in new_ids]
+            metadatas = [by_id[doc_id].metadata for doc_id in new_ids]
+
+            # embeddings calculés en parallèle, puis passés tels quels à chroma
+            vectors = _run_sync(self._aembed_all(texts))
+
+            # ajout par lots : mémoire bornée et coût d'insertion amorti
+            batch_size = self.ingest_batch_size
+            for start in range(0, len(texts), batch_size):
+                end = start + batch_size
+                batch_texts = texts[start:end]
+                self.vectorstore._collection.add(
+                    ids=new_ids[start:end],
+                    embeddings=vectors[start:end],
+                    documents=batch_texts,
+                    metadatas=metadatas[start:end],
+                )
+            # mmr : k documents pertinents mais non redondants parmi fetch_k voisins
+            self.retriever = self.vectorstore.as_retriever(
+                search_type="mmr", search_kwargs=self._search_kwargs()
             )
-            # ajuster k selon le mode
-            k_value = (
-                4 if self.engaged_mode else 2
-            )  # plus de contexte pour le mode engagé
-            self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": k_value})
+
+            # corpus modifié : les réponses mémorisées ne sont plus valables
+            if stale or new_ids:
+                self._clear_qa_cache()
         except Exception as exc:
-            self.cleanup()
+            # seule la collection de documents est abandonnée ; le cache reste valide
+            self._drop_documents()
             raise RuntimeError(f"erreur d'intégration des documents : {exc}") from exc
 
+    async def _aembed_all(
+        self, texts: List[str], batch: int = 100, concurrency: int = None
+    ) -> List[List[float]]:
+        """vectorise les textes par lots, plusieurs lots en vol à la fois.
+
+        100 textes par lot = une seule requête batchEmbedContents côté api.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.embed_concurrency)
+
+        # textes longs d'abord : lots homogènes, les plus lents partent en premier
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        ordered = [texts[i] for i in order]
+
+        async def embed_batch(chunk: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.embeddings.aembed_documents(chunk)
+
+        results = await asyncio.gather(
+            *(
+                embed_batch(ordered[i : i + batch])
+                for i in range(0, len(ordered), batch)
+            )
+        )
+
+        # remise des vecteurs dans l'ordre d'origine des textes
+        vectors = [None] * len(texts)
+        flat = (vector for result in results for vector in result)
+        for i, vector in zip(order, flat):
+            vectors[i] = vector
+        return vectors
+
     def _enrich_documents_with_indexes(
         self, documents: List[Document], indexes: Dict[str, Dict[str, List[str]]]
     ) -> List[Document]:
-        """enrichit les documents avec les informations d'index."""
+        """enrichit les documents avec les informations d'index.
+
+        `indexes` est la forme inversée (voir `_reverse_indexes`) : une recherche
+        par document et par index au lieu d'un parcours de toutes les catégories.
+        """
         enriched_docs = []
+        type_index = indexes.get("type", {})
+        status_index = indexes.get("status", {})
+        habitat_index = indexes.get("habitat", {})
+        color_index = indexes.get("color", {})
 
         for doc in documents:
             pokemon_name = doc.metadata.get("name", "").lower()
@@ -200,48 +678,39 @@ class RAGSystem:
                     pokemon_name = doc.metadata.get("pokemon_name", "").lower()
 
             if pokemon_name:
-                # ajouter les informations d'index aux métadonnées
-                enriched_metadata = doc.metadata.copy()
+                # informations d'index à ajouter aux métadonnées
+                extra = {}
 
                 # types - convertir en chaîne
-                pokemon_types = []
-                for type_name, pokemon_list in indexes.get("type", {}).items():
-                    if pokemon_name in pokemon_list:
-                        pokemon_types.append(type_name)
+                pokemon_types = type_index.get(pokemon_name)
                 if pokemon_types:
-                    enriched_metadata["pokemon_types"] = ", ".join(pokemon_types)
+                    extra["pokemon_types"] = ", ".join(pokemon_types)
 
                 # statut (légendaire, mythique, bébé)
-                for status, pokemon_list in indexes.get("status", {}).items():
-                    if pokemon_name in pokemon_list:
-                        enriched_metadata[f"is_{status}"] = True
+                for status in status_index.get(pokemon_name, ()):
+                    extra[f"is_{status}"] = True
 
-                # habitat
-                for habitat_name, pokemon_list in indexes.get("habitat", {}).items():
-                    if pokemon_name in pokemon_list:
-                        enriched_metadata["habitat"] = habitat_name
+                # habitat (la dernière catégorie de l'index l'emporte, comme avant)
+                habitats = habitat_index.get(pokemon_name)
+                if habitats:
+                    extra["habitat"] = habitats[-1]
 
                 # couleur
-                for color_name, pokemon_list in indexes.get("color", {}).items():
-                    if pokemon_name in pokemon_list:
-                        enriched_metadata["color"] = color_name
-
-                # filtrer manuellement les métadonnées complexes
-                filtered_metadata = {}
-                for key, value in enriched_metadata.items():
-                    if isinstance(value, (str, int, float, bool, type(None))):
-                        filtered_metadata[key] = value
-                    elif isinstance(value, list):
-                        # convertir les listes en chaînes
-                        filtered_metadata[key] = ", ".join(str(item) for item in value)
-                    elif isinstance(value, dict):
-                        # convertir les dictionnaires en chaînes json
-                        import json
-
-                        filtered_metadata[key] = json.dumps(value, ensure_ascii=False)
-                    else:
-                        # convertir les autres types en chaînes
-                        filtered_metadata[key] = str(value)
+                colors = color_index.get(pokemon_name)
+                if colors:
+                    extra["color"] = colors[-1]
+
+                # filtrage des métadonnées d'origine ; scalaires recopiés sans conversion
+                filtered_metadata = {
+                    key: (
+                        value
+                        if type(value) in _SCALAR_TYPES
+                        else _flatten_metadata_value(value)
+                    )
+                    for key, value in doc.metadata.items()
+                }
+                # les valeurs d'index sont déjà des chaînes / booléens
+                filtered_metadata.update(extra)
 
                 # créer un nouveau document avec les métadonnées enrichies
                 enriched_doc = Document(
@@ -254,158 +723,258 @@ class RAGSystem:
 
         return enriched_docs
 
+    def _new_qa_cache(self):
+        """collection chroma (vide ou existante) du cache de réponses."""
+        from langchain_community.vectorstores import Chroma
+
+        return Chroma(
+            client=self._chroma_client,
+            collection_name=self._qa_collection_name,
+            embedding_function=self.embeddings,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+
+    def _delete_collection(self, name: str) -> None:
+        try:
+            self._chroma_client.delete_collection(name)
+        except Exception:
+            # collection jamais créée ou déjà supprimée
+            pass
+
+    def _drop_documents(self) -> None:
+        """supprime la collection de documents ; une nouvelle intégration repart à vide."""
+        self._delete_collection(self._collection_name)
+        self.vectorstore = None
+        self.retriever = None
+
     def cleanup(self):
-        """supprime le dossier temporaire chroma."""
-        import shutil
+        """supprime les collections chroma de l'instance (le client reste partagé).
 
-        if self.persist_directory.exists():
-            shutil.rmtree(self.persist_directory, ignore_errors=True)
+        l'instance reste utilisable : il suffit de réintégrer les documents.
+        """
+        self._drop_documents()
+        self._delete_collection(self._qa_collection_name)
+        self.qa_cache = self._new_qa_cache()
+        self._qa_cache_ids.clear()
+        self._exact_cache.clear()
 
     def __del__(self):
         try:
-            self.cleanup()
+            # fin de vie : pas de nouvelle collection de cache
+            self._delete_collection(self._collection_name)
+            self._delete_collection(self._qa_collection_name)
         except:
             # ignore les erreurs lors de la fermeture de python
             pass
 
     def _update_prompt_template(self):
         """met à jour le prompt template selon le mode engagé."""
-        if self.engaged_mode:
-            self.prompt_template = PromptTemplate.from_template(
-                """you are a pokémon encyclopedia assistant. your task is to provide accurate, comprehensive, and well-structured information about pokémon based exclusively on the context provided below.
-
-critical instructions:
-1. only use information from the provided context. if the answer is not in the context, respond with "i don't have enough information to answer this question accurately."
-2. search thoroughly through the context for relevant information before answering.
-3. use all available context - do not ignore any relevant details.
-4. cite specific information from the context when possible.
-5. distinguish between different data sources in the context (pokeapi vs poképédia).
-
-context analysis guidelines:
-- for statistical questions (stats, types, abilities, evolution): look for pokeapi data first
-- for descriptive questions (appearance, behavior, lore): look for poképédia data first
-- for categorization questions (lists, types, habitats): use metadata indexes when available
-- for comparison questions: extract specific values from the context and compare them
-- for detailed descriptions: combine information from multiple context sources
+        # mode inchangé : prompt et chaîne toujours valides
+        if self._prompt_mode == self.engaged_mode:
+            return
+        self._prompt_mode = self.engaged_mode
+        self._chain = None
 
-response structure:
-1. start with a direct answer to the question
-2. provide specific details from the context
-3. mention the source of information when relevant
-4. structure information logically (most important first)
-5. include numerical data when available in the context
-
-context sources to use:
-- pokeapi data: technical specifications, statistics, types, abilities, evolution chains
-- poképédia data: descriptions, biology, behavior, habitat, mythology, cultural aspects
-- metadata indexes: pokemon_types, is_legendary, is_mythical, habitat, color information
-
-question: {question}
-context: {context}
-
-answer:"""
-            )
-        else:
-            self.prompt_template = PromptTemplate.from_template(
-                """you are a pokémon encyclopedia assistant. provide accurate and concise answers based exclusively on the context provided below.
-
-critical instructions:
-1. only use information from the provided context. if the answer is not in the context, respond with "i don't have enough information to answer this question accurately."
-2. search thoroughly through the context for relevant information.
-3. use all available context - do not ignore relevant details.
-4. be specific - cite exact values, names, and details from the context.
-
-context search strategy:
-- for statistics questions: look for pokeapi data with specific numbers
-- for description questions: look for poképédia content with detailed explanations
-- for list questions: use metadata indexes and context information
-- for comparison questions: extract and compare specific values from context
-- for general questions: combine the most relevant information from all sources
-
-response guidelines:
-1. keep answers concise but informative (3-5 sentences)
-2. start with the most important information
-3. include specific details from the context
-5. use exact values and names from the context
-
-context sources:
-- pokeapi: statistics, types, abilities, technical data
-- poképédia: descriptions, behavior, habitat, lore
-- metadata: type information, legendary status, habitat, color
-
-question: {question}
-context: {context}
-
-answer:"""
-            )
+        self._prompt_str = _PROMPT_ENGAGED if self.engaged_mode else _PROMPT_DEFAULT
 
         # mettre à jour la configuration du retriever si il existe
         if self.retriever and hasattr(self.retriever, "search_kwargs"):
-            k_value = 4 if self.engaged_mode else 2
-            self.retriever.search_kwargs["k"] = k_value
+            self.retriever.search_kwargs.update(self._search_kwargs())
+
+    def _search_kwargs(self) -> Dict[str, Any]:
+        """paramètres de recherche selon le mode (plus de contexte en mode engagé)."""
+        k_value = 4 if self.engaged_mode else 2
+        return {"k": k_value, "fetch_k": max(4 * k_value, 20), "lambda_mult": 0.5}
 
     def update_temperature(self, temperature: float):
         """met à jour la température du modèle llm."""
         self.llm.temperature = temperature
-        print(f"🌡️ température mise à jour: {temperature}")
-
-    @staticmethod
-    def _format_docs(docs: List[Document]) -> str:
-        return "\n\n".join(doc.page_content for doc in docs)
+        # les réponses mémorisées ont été générées avec l'ancienne température
+        self._clear_qa_cache()
+        logger.debug("température mise à jour: %s", temperature)
 
     def _build_chain(self):
-        """chaîne rag (retriever → prompt → llm)."""
+        """chaîne de génération (prompt → llm) ; le contexte est récupéré en amont."""
+        from langchain.schema import StrOutputParser
+        from langchain.schema.runnable import RunnableLambda
+
+        # gabarit à deux variables : format_map suffit, sans analyse par invocation
         return (
-            {
-                "context": self.retriever | self._format_docs,
-                "question": RunnablePassthrough(),
-            }
-            | self.prompt_template
-            | self.llm
-            | StrOutputParser()
+            RunnableLambda(self._prompt_str.format_map) | self.llm | StrOutputParser()
         )
 
-    def query(self, question: str) -> Dict[str, Any]:
-        """interroge le système ; renvoie answer + context + metadata."""
+    @staticmethod
+    def _chain_inputs(question: str, contents: List[str]) -> Dict[str, str]:
+        return {"question": question, "context": "\n\n".join(contents)}
+
+    def _exact_key(self, question: str) -> Tuple[bool, str]:
+        return self.engaged_mode, " ".join(question.lower().split())
+
+    def _question_entities(self, question: str) -> str:
+        """pokémon cités dans la question, triés et joints (chaîne vide si aucun)."""
+        if self._entity_re is None:
+            return ""
+        return ",".join(sorted(set(self._entity_re.findall(question.lower()))))
+
+    def _qa_filter(self, question: str) -> Dict[str, Any]:
+        return {
+            "$and": [
+                {"engaged_mode": self.engaged_mode},
+                {"entities": self._question_entities(question)},
+            ]
+        }
+
+    def _clear_qa_cache(self) -> None:
+        """vide les deux niveaux du cache de réponses."""
+        if self._qa_cache_ids:
+            self.qa_cache.delete(ids=list(self._qa_cache_ids))
+            self._qa_cache_ids.clear()
+        self._exact_cache.clear()
+
+    def _cached_answer(self, question: str):
+        """réponse d'une question identique ou proche déjà posée, sinon None."""
+        if not self.qa_cache_enabled or not self._qa_cache_ids:
+            return None
+
+        key = self._exact_key(question)
+        exact = self._exact_cache.get(key)
+        if exact is not None:
+            self._exact_cache.move_to_end(key)
+            return dict(exact)
+
+        # vecteur de type requête, comme à l'enregistrement ; le retriever réutilise
+        # ensuite le même vecteur (cache mémoire de CachedEmbeddings)
+        hits = self.qa_cache.similarity_search_by_vector_with_relevance_scores(
+            self.embeddings.embed_query(question),
+            k=1,
+            filter=self._qa_filter(question),
+        )
+        if not hits or hits[0][1] >= self.qa_cache_threshold:
+            return None
+        meta = hits[0][0].metadata
+        return {
+            "answer": meta["answer"],
+            "context": orjson.loads(meta["context"]),
+            "metadata": orjson.loads(meta["metadata"]),
+            "search_type": "cache",
+        }
+
+    def _cache_answer(self, question: str, result: Dict[str, Any]) -> None:
+        """mémorise une réponse ; les plus anciennes sortent au-delà de la taille max."""
+        if not self.qa_cache_enabled:
+            return
+
+        entry_id = uuid.uuid4().hex
+        # vecteur de requête déjà calculé pour la recherche : pas d'appel api en plus
+        self.qa_cache._collection.add(
+            ids=[entry_id],
+            embeddings=[self.embeddings.embed_query(question)],
+            documents=[question],
+            metadatas=[
+                {
+                    "answer": result["answer"],
+                    "context": orjson.dumps(result["context"]).decode(),
+                    "metadata": orjson.dumps(result["metadata"]).decode(),
+                    "engaged_mode": self.engaged_mode,
+                    "entities": self._question_entities(question),
+                }
+            ],
+        )
+        self._qa_cache_ids.append(entry_id)
+
+        self._exact_cache[self._exact_key(question)] = {
+            "answer": result["answer"],
+            "context": result["context"],
+            "metadata": result["metadata"],
+            "search_type": "cache",
+        }
+        if len(self._exact_cache) > self.qa_cache_size:
+            self._exact_cache.popitem(last=False)
+
+        if len(self._qa_cache_ids) > self.qa_cache_size:
+            stale = [
+                self._qa_cache_ids.popleft()
+                for _ in range(len(self._qa_cache_ids) - self.qa_cache_size)
+            ]
+            self.qa_cache.delete(ids=stale)
+
+    def _search_failed(self, exc: Exception) -> RuntimeError:
+        """journalise l'échec d'une recherche ; renvoie l'erreur à lever."""
+        logger.error("erreur durant la recherche: %s", exc)
+        # en cas d'erreur, on réinitialise chroma pour éviter les corruptions
+        self.vectorstore = None
+        self.retriever = None
+        return RuntimeError(f"erreur durant la recherche : {exc}")
+
+    def _stream_answer(
+        self, question: str, contents: List[str], result: Dict[str, Any]
+    ) -> Iterator[str]:
+        """génère la réponse fragment par fragment ; mise en cache une fois complète."""
+        try:
+            chunks = []
+            for chunk in self._chain.stream(self._chain_inputs(question, contents)):
+                chunks.append(chunk)
+                yield chunk
+
+            answer = "".join(chunks)
+            logger.debug("réponse générée: %d caractères", len(answer))
+            self._cache_answer(question, {**result, "answer": answer})
+        except Exception as exc:
+            raise self._search_failed(exc) from exc
+
+    def query_stream(self, question: str) -> Dict[str, Any]:
+        """interroge le système ; comme query(), mais "answer" est un itérateur.
+
+        contexte et métadonnées sont disponibles tout de suite ; la réponse arrive
+        au fil de la génération, le premier fragment sans attendre la fin.
+        """
         if not self.retriever:
             raise ValueError(
                 "aucun document n'a été intégré (retriever non initialisé)."
             )
 
-        # debug console - affichage des informations de requête
-        print("=" * 60)
-        print("debug rag - nouvelle requête")
-        print("=" * 60)
-        print(f"question: {question}")
-        print(f"température: {self.llm.temperature}")
-        print(f"max tokens: {self.llm.max_output_tokens}")
-        print(f"modèle: {self.llm.model}")
-        print(f"mode engagé: {self.engaged_mode}")
-        print(f"k documents: {self.retriever.search_kwargs.get('k', 'n/a')}")
-        print("-" * 60)
+        # debug - informations de requête (rien n'est formaté hors niveau debug)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "nouvelle requête - question: %s | température: %s | max tokens: %s"
+                " | modèle: %s | mode engagé: %s | k documents: %s",
+                question,
+                self.llm.temperature,
+                self.llm.max_output_tokens,
+                self.llm.model,
+                self.engaged_mode,
+                self.retriever.search_kwargs.get("k", "n/a"),
+            )
+
+        # question déjà traitée : ni retriever ni llm, réponse en un seul fragment
+        cached = self._cached_answer(question)
+        if cached is not None:
+            logger.debug("réponse servie depuis le cache de réponses")
+            cached["answer"] = iter((cached["answer"],))
+            return cached
 
         # recherche sémantique (llm + rag)
-        print("recherche sémantique (rag) en cours...")
         try:
             docs = self.retriever.invoke(question)
-            print(f"documents récupérés: {len(docs)}")
-
-            answer_chain = self._build_chain()
-            answer = answer_chain.invoke(question)
-
-            print(f"réponse générée: {len(answer)} caractères")
-            print("=" * 60)
-
-            return {
-                "answer": answer,
-                "context": [doc.page_content for doc in docs],
-                "metadata": [doc.metadata for doc in docs],
-                "search_type": "semantic",
-            }
+            logger.debug("documents récupérés: %d", len(docs))
+            if self._chain is None:
+                self._chain = self._build_chain()
         except Exception as exc:
-            print(f"erreur: {exc}")
-            print("=" * 60)
-            # en cas d'erreur, on réinitialise chroma pour éviter les corruptions
-            self.vectorstore = None
-            self.retriever = None
-            raise RuntimeError(f"erreur durant la recherche : {exc}") from exc
+            raise self._search_failed(exc) from exc
+
+        # textes extraits une seule fois : prompt et résultat
+        contents = list(map(_PAGE_CONTENT, docs))
+        result = {
+            "context": contents,
+            "metadata": list(map(_METADATA, docs)),
+            "search_type": "semantic",
+        }
+        # contexte déjà récupéré : pas de seconde recherche dans chroma
+        result["answer"] = self._stream_answer(question, contents, result)
+        return result
+
+    def query(self, question: str) -> Dict[str, Any]:
+        """interroge le système ; renvoie answer + context + metadata."""
+        result = self.query_stream(question)
+        result["answer"] = "".join(result["answer"])
+        return result
@@ -1,14 +1,21 @@
-import requests
 import json
+import orjson
 import os
+import re
 import time
+import copy
 import logging
+from collections import defaultdict
+from functools import lru_cache
 from typing import Dict, List, Any, Set
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_cache import CachedSession
 
 # config du logging
 logging.basicConfig(
-    level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s"
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
@@ -18,83 +25,114 @@ DATA_DIR = "data/pokeapi"
 REQUEST_DELAY = 0.1  # délai entre requêtes
 MAX_WORKERS = 5  # nombre de workers
 GENERATION_ID = 1  # génération 1 uniquement
+REQUEST_TIMEOUT = (3.05, 30)  # connexion, lecture
+
+HTTP_CACHE = "data/.http_cache"  # cache http partagé avec scrap_pokepedia
+
+# session partagée par les workers : connexions keep-alive réutilisées,
+# reprises avec backoff sur les erreurs transitoires, et cache disque (une
+# relance ne retélécharge que ce qui a changé)
+SESSION = CachedSession(
+    HTTP_CACHE,
+    backend="sqlite",
+    cache_control=True,
+    expire_after=86400,
+    stale_if_error=True,
+)
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=MAX_WORKERS,
+        pool_maxsize=MAX_WORKERS * 2,
+        max_retries=Retry(
+            total=5, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]
+        ),
+    ),
+)
 
 # crée le dossier de sortie
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
 # fonctions utilitaires
+
+# suffixes de formes alternatives (aucun n'est suffixe d'un autre)
+FORM_SUFFIXES = [
+    "-mega",
+    "-mega-x",
+    "-mega-y",
+    "-alola",
+    "-galar",
+    "-hisui",
+    "-gmax",
+    "-eternamax",
+    "-ash",
+    "-power-construct",
+    "-complete",
+    "-10",
+    "-50",
+    "-100",
+    "-therian",
+    "-incarnate",
+    "-land",
+    "-sky",
+    "-ordinary",
+    "-aria",
+    "-baile",
+    "-midday",
+    "-midnight",
+    "-dusk",
+    "-dawn",
+    "-shield",
+    "-solo",
+    "-school",
+    "-red-striped",
+    "-blue-striped",
+    "-east",
+    "-west",
+    "-fan",
+    "-frost",
+    "-heat",
+    "-mow",
+    "-wash",
+    "-normal",
+    "-plant",
+    "-sandy",
+    "-trash",
+    "-overcast",
+    "-sunny",
+    "-rainy",
+    "-snowy",
+    "-attack",
+    "-defense",
+    "-speed",
+]
+
+# une seule expression compilée au lieu d'une boucle de endswith
+FORM_SUFFIX_RE = re.compile(
+    "(?:" + "|".join(re.escape(suffix) for suffix in FORM_SUFFIXES) + r")\Z"
+)
+
+
 def get_base_pokemon_name(name: str) -> str:
     """extrait le nom de base"""
-    suffixes = [
-        "-mega",
-        "-mega-x",
-        "-mega-y",
-        "-alola",
-        "-galar",
-        "-hisui",
-        "-gmax",
-        "-eternamax",
-        "-ash",
-        "-power-construct",
-        "-complete",
-        "-10",
-        "-50",
-        "-100",
-        "-therian",
-        "-incarnate",
-        "-land",
-        "-sky",
-        "-ordinary",
-        "-aria",
-        "-baile",
-        "-midday",
-        "-midnight",
-        "-dusk",
-        "-dawn",
-        "-shield",
-        "-solo",
-        "-school",
-        "-red-striped",
-        "-blue-striped",
-        "-east",
-        "-west",
-        "-fan",
-        "-frost",
-        "-heat",
-        "-mow",
-        "-wash",
-        "-normal",
-        "-plant",
-        "-sandy",
-        "-trash",
-        "-overcast",
-        "-sunny",
-        "-rainy",
-        "-snowy",
-        "-attack",
-        "-defense",
-        "-speed",
-    ]
-    for suffix in suffixes:
-        if name.endswith(suffix):
-            return name[: -len(suffix)]
-    return name
+    match = FORM_SUFFIX_RE.search(name)
+    return name[: match.start()] if match else name
 
 
 def get_generation_pokemon_names(gen_id: int) -> Set[str]:
     """récupère les noms d'une génération"""
-    logger.info(f"récupération génération {gen_id}…")
+    logger.info("récupération génération %s…", gen_id)
     url = f"{BASE_URL}/generation/{gen_id}"
     try:
-        response = requests.get(url)
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         names = {species["name"] for species in data.get("pokemon_species", [])}
-        logger.info(f"{len(names)} espèces trouvées")
+        logger.info("%d espèces trouvées", len(names))
         return names
     except Exception as e:
-        logger.error(f"erreur génération {gen_id}: {str(e)}", exc_info=True)
+        logger.error("erreur génération %s: %s", gen_id, e, exc_info=True)
         return set()
 
 
@@ -103,86 +141,90 @@ def get_pokemon_list() -> List[Dict[str, Any]]:
     logger.info("récupération liste complète…")
     url = f"{BASE_URL}/pokemon?limit=2000"
     try:
-        response = requests.get(url)
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         return data["results"]
     except Exception as e:
-        logger.error(f"erreur liste: {str(e)}", exc_info=True)
+        logger.error("erreur liste: %s", e, exc_info=True)
         return []
 
 
 # récupération et nettoyage
-def strip_urls_from_dict(data: Dict[str, Any]):
-    """supprime les urls"""
-    if isinstance(data, dict):
-        for key in list(data.keys()):
-            if "url" in key.lower():
-                del data[key]
-            else:
-                strip_urls_from_dict(data[key])
-    elif isinstance(data, list):
-        for item in data:
-            strip_urls_from_dict(item)
+def drop_url_keys(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """supprime les urls (object_hook : chaque objet est filtré dès son décodage)"""
+    return {key: value for key, value in obj.items() if "url" not in key.lower()}
+
+
+def fetch_json_without_urls(url: str) -> Dict[str, Any]:
+    """télécharge un json en écartant les clés url au décodage, sans second parcours.
+
+    json standard ici plutôt qu'orjson : seul lui accepte un object_hook.
+    """
+    response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return json.loads(response.content, object_hook=drop_url_keys)
+
+
+@lru_cache(maxsize=2048)
+def _fetch_species(name: str) -> Dict[str, Any]:
+    """télécharge et filtre une espèce ; mémoïsé, les erreurs ne sont pas gardées"""
+    data = fetch_json_without_urls(f"{BASE_URL}/pokemon-species/{name}")
+
+    # filtrage
+    filtered: Dict[str, Any] = {}
+
+    # champs utiles
+    for key in [
+        "id",
+        "name",
+        "order",
+        "gender_rate",
+        "capture_rate",
+        "base_happiness",
+        "is_baby",
+        "is_legendary",
+        "is_mythical",
+        "hatch_counter",
+        "has_gender_differences",
+        "forms_switchable",
+        "growth_rate",
+        "color",
+        "habitat",
+    ]:
+        if key in data:
+            filtered[key] = data[key]
+
+    # noms et descriptions
+    if "names" in data:
+        filtered["names"] = [
+            n for n in data["names"] if n["language"]["name"] in {"en", "fr", "ja"}
+        ]
+    if "flavor_text_entries" in data:
+        filtered["flavor_text_entries"] = [
+            f
+            for f in data["flavor_text_entries"]
+            if f["language"]["name"] in {"en", "fr", "ja"}
+        ]
+    if "genera" in data:
+        filtered["genera"] = [
+            g for g in data["genera"] if g["language"]["name"] in {"en", "fr", "ja"}
+        ]
+
+    # chaîne d'évolution
+    if "evolution_chain" in data:
+        filtered["evolution_chain"] = data["evolution_chain"]
+
+    return filtered
 
 
 def get_pokemon_species(name: str) -> Dict[str, Any]:
     """récupère les infos d'espèce"""
-    url = f"{BASE_URL}/pokemon-species/{name}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        # filtrage
-        filtered: Dict[str, Any] = {}
-
-        # champs utiles
-        for key in [
-            "id",
-            "name",
-            "order",
-            "gender_rate",
-            "capture_rate",
-            "base_happiness",
-            "is_baby",
-            "is_legendary",
-            "is_mythical",
-            "hatch_counter",
-            "has_gender_differences",
-            "forms_switchable",
-            "growth_rate",
-            "color",
-            "habitat",
-        ]:
-            if key in data:
-                filtered[key] = data[key]
-
-        # noms et descriptions
-        if "names" in data:
-            filtered["names"] = [
-                n for n in data["names"] if n["language"]["name"] in {"en", "fr", "ja"}
-            ]
-        if "flavor_text_entries" in data:
-            filtered["flavor_text_entries"] = [
-                f
-                for f in data["flavor_text_entries"]
-                if f["language"]["name"] in {"en", "fr", "ja"}
-            ]
-        if "genera" in data:
-            filtered["genera"] = [
-                g for g in data["genera"] if g["language"]["name"] in {"en", "fr", "ja"}
-            ]
-
-        # chaîne d'évolution
-        if "evolution_chain" in data:
-            filtered["evolution_chain"] = data["evolution_chain"]
-
-        # supprime les urls
-        strip_urls_from_dict(filtered)
-        return filtered
+        # une espèce est partagée par toutes ses formes : un seul téléchargement
+        return copy.deepcopy(_fetch_species(name))
     except Exception as e:
-        logger.error(f"erreur espèce {name}: {str(e)}", exc_info=True)
+        logger.error("erreur espèce %s: %r", name, e)
         return {}
 
 
@@ -191,18 +233,13 @@ def get_pokemon_details(pokemon: Dict[str, Any]) -> Dict[str, Any]:
     name = pokemon["name"]
     url = pokemon["url"]
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_json_without_urls(url)
 
         # nettoyage
         for noisy_field in ["moves", "location_area_encounters", "sprites"]:
             if noisy_field in data:
                 del data[noisy_field]
 
-        # supprime les urls
-        strip_urls_from_dict(data)
-
         # infos d'espèce
         base_name = get_base_pokemon_name(name)
         species_info = get_pokemon_species(base_name)
@@ -212,7 +249,7 @@ def get_pokemon_details(pokemon: Dict[str, Any]) -> Dict[str, Any]:
 
         return data
     except Exception as e:
-        logger.error(f"erreur détails {name}: {str(e)}", exc_info=True)
+        logger.error("erreur détails %s: %r", name, e)
         return {}
 
 
@@ -222,12 +259,18 @@ def save_pokemon_data(content: Dict[str, Any], name: str):
     if not content:
         return
     path = os.path.join(DATA_DIR, f"{name}.json")
+    tmp_path = f"{path}.tmp"
     try:
-        with open(path, "w", encoding="utf-8") as fp:
-            json.dump(content, fp, ensure_ascii=False, indent=2)
-        logger.debug(f"sauvegardé : {path}")
+        # écriture à côté puis renommage atomique : un fichier présent est toujours
+        # complet, la relance peut se fier à os.path.exists
+        with open(tmp_path, "wb") as fp:
+            fp.write(orjson.dumps(content, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, path)
+        logger.debug("sauvegardé : %s", path)
     except Exception as e:
-        logger.error(f"erreur sauvegarde {name}: {str(e)}", exc_info=True)
+        logger.error("erreur sauvegarde %s: %s", name, e, exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 # traitement parallèle
@@ -236,7 +279,7 @@ def process_pokemon(pokemon: Dict[str, Any]) -> bool:
     name = pokemon["name"]
     path = os.path.join(DATA_DIR, f"{name}.json")
     if os.path.exists(path):
-        logger.debug(f"{name} déjà présent")
+        logger.debug("%s déjà présent", name)
         return True
 
     details = get_pokemon_details(pokemon)
@@ -247,6 +290,12 @@ def process_pokemon(pokemon: Dict[str, Any]) -> bool:
     return False
 
 
+def process_species(forms: List[Dict[str, Any]]) -> List[bool]:
+    """traite les formes d'une même espèce à la suite : l'espèce n'est téléchargée
+    qu'une fois, les formes suivantes la trouvent en cache"""
+    return [process_pokemon(p) for p in forms]
+
+
 # point d'entrée
 def main():
     logger.info("--- scraping pokémon (génération 4) ---")
@@ -256,27 +305,36 @@ def main():
         logger.error("liste vide")
         return
 
-    # liste complète puis filtrage
-    all_pokemon = get_pokemon_list()
-    pokemon_list = [
-        p for p in all_pokemon if get_base_pokemon_name(p["name"]) in allowed_species
-    ]
-    logger.info(f"{len(pokemon_list)} formes à traiter")
+    # liste complète puis filtrage, formes regroupées par espèce
+    forms_by_species = defaultdict(list)
+    for p in get_pokemon_list():
+        base_name = get_base_pokemon_name(p["name"])
+        if base_name in allowed_species:
+            forms_by_species[base_name].append(p)
+    logger.info(
+        "%d formes à traiter (%d espèces)",
+        sum(map(len, forms_by_species.values())),
+        len(forms_by_species),
+    )
 
     success = failed = 0
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(process_pokemon, p): p for p in pokemon_list}
+        # une tâche par espèce : deux workers ne téléchargent jamais la même espèce
+        futures = {
+            executor.submit(process_species, forms): forms
+            for forms in forms_by_species.values()
+        }
         for future in as_completed(futures):
             try:
-                if future.result():
-                    success += 1
-                else:
-                    failed += 1
+                results = future.result()
             except Exception as e:
-                logger.error(f"erreur: {str(e)}", exc_info=True)
-                failed += 1
+                logger.error("erreur: %s", e, exc_info=True)
+                failed += len(futures[future])
+                continue
+            success += sum(results)
+            failed += len(results) - sum(results)
 
-    logger.info(f"--- terminé. succès: {success} | échecs: {failed} ---")
+    logger.info("--- terminé. succès: %d | échecs: %d ---", success, failed)
 
 
 if __name__ == "__main__":
@@ -1,32 +1,104 @@
 import os
+import re
 import time
-import json
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Tuple
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_cache import CachedSession
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+from lxml import html as lxml_html
 
 BASE_URL = "https://www.pokepedia.fr"
 DATA_DIR = "data/pokepedia"
-REQUEST_DELAY = 0.1
+# Intervalle minimal entre deux départs de requête, tous workers confondus
+# (0,5 s : au plus deux pages par seconde, le rythme de l'ancien parcours séquentiel)
+REQUEST_DELAY = float(os.getenv("POKEPEDIA_REQUEST_INTERVAL", "0.5"))
+MAX_WORKERS = 4  # Pages téléchargées en parallèle
 MAX_PAGES = None  # Parcours complet par défaut
+REQUEST_TIMEOUT = (3.05, 30)  # connexion, lecture
+
+HTTP_CACHE = "data/.http_cache"  # Cache HTTP partagé avec scrap_pokeapi
+
+# Session unique : la connexion au wiki est réutilisée d'une page à l'autre, et
+# le cache disque évite de retélécharger les pages inchangées lors d'une relance
+SESSION = CachedSession(
+    HTTP_CACHE,
+    backend="sqlite",
+    cache_control=True,
+    expire_after=86400,
+    stale_if_error=True,
+)
+SESSION.headers["User-Agent"] = "Mozilla/5.0"
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        max_retries=Retry(
+            total=5, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504]
+        )
+    ),
+)
 
 # Catégorie des Pokémon de la première génération
 CATEGORY_URL = (
     f"{BASE_URL}/Cat%C3%A9gorie:Pok%C3%A9mon_de_la_premi%C3%A8re_g%C3%A9n%C3%A9ration"
 )
 
+# Crée le dossier de sortie une fois pour toutes
+os.makedirs(DATA_DIR, exist_ok=True)
+
+
+class RateLimiter:
+    """Espace les départs de requêtes, tous workers confondus, d'au moins `interval`
+    secondes : le débit est plafonné sans qu'un worker dorme après chaque page."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+LIMITER = RateLimiter(REQUEST_DELAY)
+
+# Parseur HTML en C (libxml2)
+HTML_PARSER = "lxml"
+# Requêtes XPath compilées une fois pour toutes les pages
+CONTENT_XPATH = etree.XPath(
+    '//div[contains(concat(" ", normalize-space(@class), " "), '
+    '" mw-parser-output ")]'
+)
+TEXT_XPATH = etree.XPath(".//text()")
+
+# Listes de la page de catégorie (seules leurs ancres sont lues)
+CATEGORY_STRAINER = SoupStrainer(
+    "div", attrs={"class": re.compile(r"(?:^|\s)mw-category(?:\s|$)")}
+)
+# Balises sans texte utile dans le corps d'article
+NOISE_TAGS = ["script", "style", "footer", "nav", "header", "table"]
+
 
 def get_category_links(limit: Optional[int] = MAX_PAGES) -> List[Tuple[str, str]]:
     """Récupère les liens de la catégorie des Pokémon de première génération."""
-    headers = {"User-Agent": "Mozilla/5.0"}
     try:
-        resp = requests.get(CATEGORY_URL, headers=headers)
+        resp = SESSION.get(CATEGORY_URL, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
     except Exception as exc:
         print(f"Erreur lors de la récupération de la catégorie: {exc}")
         return []
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    soup = BeautifulSoup(resp.content, HTML_PARSER, parse_only=CATEGORY_STRAINER)
     anchors = soup.select("div.mw-category a")
     links: List[Tuple[str, str]] = []
     seen = set()
@@ -45,48 +117,70 @@ def get_category_links(limit: Optional[int] = MAX_PAGES) -> List[Tuple[str, str]
     return links
 
 
-def extract_paragraphs(html: str) -> str:
-    """Extrait les paragraphes pertinents d'une page."""
-    soup = BeautifulSoup(html, "html.parser")
+def extract_paragraphs(html: bytes) -> str:
+    """Extrait les paragraphes pertinents d'une page, directement sur l'arbre lxml."""
+    if not html.strip():
+        return ""
+    tree = lxml_html.fromstring(html)
+    # Corps d'article MediaWiki (l'attribut class peut porter plusieurs valeurs)
+    matches = CONTENT_XPATH(tree)
+    content = matches[0] if matches else tree
+
+    # Suppression en C ; le texte qui suit une balise retirée est conservé
+    etree.strip_elements(content, *NOISE_TAGS, with_tail=False)
+
+    paragraphs = []
+    for p in content.iter("p"):
+        # Texte des nœuds sans les commentaires, fragments nettoyés et joints par
+        # une espace
+        strings = (string.strip() for string in TEXT_XPATH(p))
+        text = " ".join(string for string in strings if string)
+        if text:
+            paragraphs.append(text)
+    return "\n\n".join(paragraphs)
 
-    for tag in soup(["script", "style", "footer", "nav", "header", "table"]):
-        tag.decompose()
 
-    content = soup.find("div", class_="mw-parser-output") or soup
-    paragraphs = [
-        p.get_text(" ", strip=True)
-        for p in content.find_all("p")
-        if p.get_text(strip=True)
-    ]
-    return "\n\n".join(paragraphs)
+def is_fresh_in_cache(url: str) -> bool:
+    """Vrai si le cache HTTP peut servir la page sans contacter le wiki."""
+    cache = SESSION.cache
+    response = cache.get_response(cache.create_key(requests.Request("GET", url)))
+    return response is not None and not response.is_expired
 
 
 def fetch_page(url: str) -> str:
-    headers = {"User-Agent": "Mozilla/5.0"}
-    resp = requests.get(url, headers=headers)
+    # Une page servie par le cache ne coûte rien au wiki : pas d'attente
+    if not is_fresh_in_cache(url):
+        LIMITER.wait()
+    resp = SESSION.get(url, timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
-    return extract_paragraphs(resp.text)
+    # Octets bruts : le parseur lit directement l'encodage déclaré par la page
+    return extract_paragraphs(resp.content)
 
 
 def save_content(name: str, url: str, content: str):
-    os.makedirs(DATA_DIR, exist_ok=True)
     path = os.path.join(DATA_DIR, f"{name.lower()}.json")
     data = {"url": url, "content": content, "timestamp": time.time()}
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+
+def scrape_page(name: str, url: str):
+    try:
+        text = fetch_page(url)
+    except Exception as exc:
+        print(f"Erreur lors de la récupération de {url}: {exc}")
+        return
+
+    save_content(name, url, text)
 
 
 def scrape_pokepedia(max_pages: int = MAX_PAGES):
     links = get_category_links(max_pages)
-    for name, url in links:
-        try:
-            text = fetch_page(url)
-        except Exception as exc:
-            print(f"Erreur lors de la récupération de {url}: {exc}")
-            continue
-
-        save_content(name, url, text)
-        time.sleep(REQUEST_DELAY)
+    # Quelques pages en vol à la fois ; le débit global reste borné par LIMITER
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(scrape_page, name, url) for name, url in links]
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""cache de réponses : deux questions distinctes sur un même pokémon."""
+
+import os
+
+import pytest
+
+pytest.importorskip("langchain_google_genai")
+pytest.importorskip("chromadb")
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListLLM
+
+# clé factice : rag_core la vérifie à l'import, aucun appel api n'est fait
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from src.rag_core import RAGSystem  # noqa: E402
+
+TAILLE = "Quelle est la taille de Pikachu ?"
+POIDS = "Quel est le poids de Pikachu ?"
+
+
+class _Retriever:
+    """retriever factice : toujours la même fiche, sans chroma ni api."""
+
+    search_kwargs = {"k": 2}
+
+    def invoke(self, question):
+        return [
+            Document(
+                page_content="Pikachu mesure 0,4 m et pèse 6,0 kg.",
+                metadata={"name": "pikachu"},
+            )
+        ]
+
+
+def _system(tmp_path, **kwargs):
+    system = RAGSystem(persist_directory=str(tmp_path), **kwargs)
+    system.embeddings = DeterministicFakeEmbedding(size=32)
+    system.qa_cache = system._new_qa_cache()
+    system.llm = FakeListLLM(responses=["0,4 m", "6,0 kg", "0,4 m (bis)"])
+    system._chain = None
+    system.retriever = _Retriever()
+    return system
+
+
+def test_cache_disabled_by_default(tmp_path):
+    system = _system(tmp_path)
+
+    taille = system.query(TAILLE)
+    poids = system.query(POIDS)
+    again = system.query(TAILLE)
+
+    assert [taille["answer"], poids["answer"], again["answer"]] == [
+        "0,4 m",
+        "6,0 kg",
+        "0,4 m (bis)",
+    ]
+    assert {r["search_type"] for r in (taille, poids, again)} == {"semantic"}
+
+
+def test_distinct_questions_do_not_collide(tmp_path):
+    system = _system(tmp_path, qa_cache_enabled=True)
+
+    taille = system.query(TAILLE)
+    poids = system.query(POIDS)
+    again = system.query("  quelle est la TAILLE de pikachu ?")
+
+    assert poids["search_type"] == "semantic"
+    assert poids["answer"] == "6,0 kg" != taille["answer"]
+    # même question (casse et espaces près) : servie par le cache exact
+    assert again["search_type"] == "cache"
+    assert again["answer"] == "0,4 m"